@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Room, Message
+from .models import Room, Message, RoomEvent
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
@@ -10,6 +10,27 @@ class RoomAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('sender', 'room', 'content', 'created_at')
+    list_display = ('sender', 'room', 'sequence', 'content', 'created_at')
     list_filter = ('created_at', 'room')
     search_fields = ('content', 'sender__username', 'room__code')
+    readonly_fields = ('room', 'sequence')
+
+    def has_add_permission(self, request):
+        # Messages get their sequence from the room's event log
+        return False
+
+@admin.register(RoomEvent)
+class RoomEventAdmin(admin.ModelAdmin):
+    list_display = ('room', 'sequence', 'kind', 'sender', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('room__code', 'sender__username')
+    readonly_fields = ('room', 'sequence', 'kind', 'sender', 'payload', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
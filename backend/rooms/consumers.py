@@ -1,13 +1,23 @@
+import asyncio
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EVENT_BATCH_SIZE = 20  # Most events written in one transaction
+EVENT_WRITE_FAILED = 4004  # Close code when none of a batch of events could be written
 
 class RoomConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         from .models import WebSocketTicket
         self.room_code = self.scope['url_route']['kwargs']['room_code']
         self.room_group_name = f"room_{self.room_code}"
+        self.pending_events = []
+        self.flush_task = None
 
         query_params = self.scope["query_string"].decode()
         try:
@@ -33,6 +43,8 @@ class RoomConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
     async def disconnect(self, close_code):
+        if self.flush_task is not None:
+            await self.flush_task
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
     async def receive(self, text_data):
@@ -40,16 +52,8 @@ class RoomConsumer(AsyncWebsocketConsumer):
         action = data.get('action')
 
         if action == 'message':
-            content = data.get('content')
-            await self.save_message(content)
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'chat.message',
-                    'sender': self.user.username,
-                    'content': content
-                }
-            )
+            # Broadcast once written, so peers only see logged messages and get their sequence.
+            await self.queue_event('message', {'content': data.get('content')})
         elif action == 'update_shared_text':
             shared_text = data.get('shared_text')
             await self.channel_layer.group_send(
@@ -60,7 +64,7 @@ class RoomConsumer(AsyncWebsocketConsumer):
                 }
             )
         elif action == 'save_shared_text':
-            await self.update_shared_text(data.get('shared_text'))
+            await self.queue_event('shared_text', {'shared_text': data.get('shared_text')})
         elif action == 'update_drawing':
             drawing_data = data.get('drawing_data')
             await self.channel_layer.group_send(
@@ -71,7 +75,7 @@ class RoomConsumer(AsyncWebsocketConsumer):
                 }
             )
         elif action == 'save_drawing':
-            await self.update_drawing_data(data.get('drawing_data'))
+            await self.queue_event('drawing', {'drawing_data': data.get('drawing_data')})
 
     async def chat_message(self, event):
         await self.send(text_data=json.dumps(event))
@@ -88,22 +92,64 @@ class RoomConsumer(AsyncWebsocketConsumer):
             'drawing_data': event['drawing_data']
         }))
 
-    @database_sync_to_async
-    def save_message(self, content):
-        from .models import Room, Message
-        room = Room.objects.get(code=self.room_code)
-        return Message.objects.create(room=room, sender=self.user, content=content)
+    async def queue_event(self, kind, payload):
+        """Queue a write; the room state and its event log are updated together in the next batch.
 
-    @database_sync_to_async
-    def update_shared_text(self, text):
-        from .models import Room
-        room = Room.objects.get(code=self.room_code)
-        room.shared_text = text
-        room.save()
+        Events are written as soon as they arrive, in the order this consumer received them; those
+        arriving while a batch is being written form the next batch. Across consumers, events are
+        ordered by the commit of their batch under the room lock.
+        """
+        from .events import validate_event
+        if not validate_event(kind, payload):
+            logger.warning("Rejected invalid %s event for room %s", kind, self.room_code)
+            return
+        self.pending_events.append({
+            'kind': kind,
+            'payload': payload,
+            'sender': self.user,
+            'created_at': timezone.now(),
+        })
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_events())
+
+    async def flush_events(self):
+        try:
+            while self.pending_events:
+                events = self.pending_events[:EVENT_BATCH_SIZE]
+                del self.pending_events[:EVENT_BATCH_SIZE]
+                room_events = await self.write_events(events)
+                if not room_events:
+                    await self.close(code=EVENT_WRITE_FAILED)
+                    return
+                for room_event in room_events:
+                    if room_event.kind == 'message':
+                        await self.channel_layer.group_send(
+                            self.room_group_name,
+                            {
+                                'type': 'chat.message',
+                                'sender': self.user.username,
+                                'content': room_event.payload['content'],
+                                'sequence': room_event.sequence
+                            }
+                        )
+        finally:
+            self.flush_task = None
 
     @database_sync_to_async
-    def update_drawing_data(self, data):
-        from .models import Room
-        room = Room.objects.get(code=self.room_code)
-        room.drawing_data = data
-        room.save()
\ No newline at end of file
+    def write_events(self, events):
+        """Write the batch, falling back to one event at a time so a failing event cannot drop the rest."""
+        from .events import apply_events
+        try:
+            return apply_events(self.room_code, events)
+        except Exception:
+            if len(events) == 1:
+                logger.exception("Dropped %s event for room %s", events[0]['kind'], self.room_code)
+                return []
+            logger.exception("Retrying %d events for room %s one at a time", len(events), self.room_code)
+        room_events = []
+        for event in events:
+            try:
+                room_events.extend(apply_events(self.room_code, [event]))
+            except Exception:
+                logger.exception("Dropped %s event for room %s", event['kind'], self.room_code)
+        return room_events
@@ -0,0 +1,118 @@
+from django.db import transaction
+from .models import Room, RoomEvent, Message
+
+SNAPSHOT_INTERVAL = 100  # Write a snapshot every this many text and drawing events
+
+def empty_state():
+    return {'shared_text': '', 'drawing_data': {}}
+
+def apply_event(state, event):
+    if event.kind == RoomEvent.SNAPSHOT:
+        state.update(event.payload)
+    elif event.kind == RoomEvent.SHARED_TEXT:
+        state['shared_text'] = event.payload.get('shared_text')
+    elif event.kind == RoomEvent.DRAWING:
+        state['drawing_data'] = event.payload.get('drawing_data')
+    return state
+
+def rebuild_state(room, up_to=None):
+    """Rebuild the room's text and drawing state from its latest snapshot plus the event tail."""
+    events = RoomEvent.objects.filter(room=room).exclude(kind=RoomEvent.MESSAGE)
+    if up_to is not None:
+        events = events.filter(sequence__lte=up_to)
+    snapshot = events.filter(kind=RoomEvent.SNAPSHOT).order_by('-sequence').first()
+    state = empty_state()
+    if snapshot is not None:
+        apply_event(state, snapshot)
+        events = events.filter(sequence__gt=snapshot.sequence)
+    for event in events.order_by('sequence'):
+        apply_event(state, event)
+    return state
+
+def validate_event(kind, payload):
+    """Whether payload carries the value the event kind writes, so one bad event cannot fail a batch."""
+    if kind == RoomEvent.MESSAGE:
+        content = payload.get('content')
+        return isinstance(content, str) and bool(content.strip())
+    if kind == RoomEvent.SHARED_TEXT:
+        return isinstance(payload.get('shared_text'), str)
+    if kind == RoomEvent.DRAWING:
+        return payload.get('drawing_data') is not None
+    return False
+
+def content_events(data, sender=None):
+    """Events for the shared_text/drawing_data changes present in data."""
+    events = []
+    if 'shared_text' in data:
+        events.append({'kind': RoomEvent.SHARED_TEXT, 'payload': {'shared_text': data['shared_text']}, 'sender': sender})
+    if 'drawing_data' in data:
+        events.append({'kind': RoomEvent.DRAWING, 'payload': {'drawing_data': data['drawing_data']}, 'sender': sender})
+    return events
+
+def snapshot_event(room):
+    """Append a snapshot of the locked room row at its next sequence number."""
+    room.last_sequence += 1
+    room.events_since_snapshot = 0
+    return RoomEvent.objects.create(
+        room=room,
+        sequence=room.last_sequence,
+        kind=RoomEvent.SNAPSHOT,
+        payload={'shared_text': room.shared_text, 'drawing_data': room.drawing_data},
+    )
+
+def lock_room(room_code):
+    return Room.objects.select_for_update().defer('shared_text', 'drawing_data').get(code=room_code)
+
+def apply_events(room_code, events):
+    """Apply a batch of events to the room and append them to its log in one transaction.
+
+    Each event is a dict of RoomEvent field values (kind, payload and optionally sender and
+    created_at). Text and drawing events update the room's content and version, message events
+    create the Message carrying the same sequence number. A snapshot is appended once
+    SNAPSHOT_INTERVAL text and drawing events have accumulated since the last one; chat
+    messages do not count, as they leave the content unchanged.
+    """
+    if not events:
+        return []
+    with transaction.atomic():
+        room = lock_room(room_code)
+        room_events = []
+        messages = []
+        update_fields = {'last_sequence', 'events_since_snapshot'}
+        for event in events:
+            room.last_sequence += 1
+            room_event = RoomEvent(room=room, sequence=room.last_sequence, **event)
+            if room_event.kind == RoomEvent.SHARED_TEXT:
+                room.version += 1
+                room.shared_text = room_event.payload['shared_text']
+                room.text_version = room.version
+                room.events_since_snapshot += 1
+                update_fields.update(['shared_text', 'text_version', 'version', 'updated_at'])
+            elif room_event.kind == RoomEvent.DRAWING:
+                room.version += 1
+                room.drawing_data = room_event.payload['drawing_data']
+                room.drawing_version = room.version
+                room.events_since_snapshot += 1
+                update_fields.update(['drawing_data', 'drawing_version', 'version', 'updated_at'])
+            elif room_event.kind == RoomEvent.MESSAGE:
+                messages.append(Message(
+                    room=room,
+                    sender=room_event.sender,
+                    content=room_event.payload['content'],
+                    sequence=room_event.sequence,
+                ))
+            room_events.append(room_event)
+        Message.objects.bulk_create(messages)
+        RoomEvent.objects.bulk_create(room_events)
+        if room.events_since_snapshot >= SNAPSHOT_INTERVAL:
+            room_events.append(snapshot_event(room))
+        room.save(update_fields=update_fields)
+    return room_events
+
+def snapshot_room(room_code):
+    """Append a snapshot of the room's current content, e.g. to seed the log of a new room."""
+    with transaction.atomic():
+        room = lock_room(room_code)
+        event = snapshot_event(room)
+        room.save(update_fields=['last_sequence', 'events_since_snapshot'])
+    return event
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def snapshot_existing_rooms(apps, schema_editor):
+    Room = apps.get_model('rooms', 'Room')
+    RoomEvent = apps.get_model('rooms', 'RoomEvent')
+    RoomEvent.objects.bulk_create(
+        RoomEvent(
+            room=room,
+            sequence=1,
+            kind='snapshot',
+            payload={'shared_text': room.shared_text, 'drawing_data': room.drawing_data},
+        )
+        for room in Room.objects.iterator()
+    )
+    Room.objects.update(last_sequence=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0007_room_version_room_text_version_room_drawing_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='last_sequence',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='RoomEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('kind', models.CharField(choices=[('message', 'Message'), ('shared_text', 'Shared text'), ('drawing', 'Drawing'), ('snapshot', 'Snapshot')], max_length=16)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='rooms.room')),
+                ('sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['sequence'],
+                'constraints': [models.UniqueConstraint(fields=('room', 'sequence'), name='unique_room_event_sequence')],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_rooms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+def log_existing_messages(apps, schema_editor):
+    Room = apps.get_model('rooms', 'Room')
+    Message = apps.get_model('rooms', 'Message')
+    RoomEvent = apps.get_model('rooms', 'RoomEvent')
+    for room in Room.objects.filter(messages__isnull=False).distinct().only('id', 'last_sequence'):
+        messages = list(Message.objects.filter(room=room).order_by('created_at', 'id'))
+        events = []
+        for message in messages:
+            room.last_sequence += 1
+            message.sequence = room.last_sequence
+            events.append(RoomEvent(
+                room=room,
+                sequence=message.sequence,
+                kind='message',
+                sender_id=message.sender_id,
+                payload={'content': message.content},
+                created_at=message.created_at,
+            ))
+        Message.objects.bulk_update(messages, ['sequence'])
+        RoomEvent.objects.bulk_create(events)
+        room.save(update_fields=['last_sequence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0008_room_last_sequence_roomevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='sequence',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(log_existing_messages, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='sequence',
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.AlterModelOptions(
+            name='message',
+            options={'ordering': ['sequence']},
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('room', 'sequence'), name='unique_message_sequence'),
+        ),
+    ]
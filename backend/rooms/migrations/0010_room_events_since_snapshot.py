@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0009_message_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='events_since_snapshot',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -9,6 +9,11 @@ class Room(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     drawing_data = models.JSONField(default=dict)  # Store drawing data as JSON
     shared_text = models.TextField(blank=True)  # Store shared text
+    version = models.PositiveIntegerField(default=0)  # Bumped on every content change
+    text_version = models.PositiveIntegerField(default=0)  # Version of the last shared_text change
+    drawing_version = models.PositiveIntegerField(default=0)  # Version of the last drawing_data change
+    last_sequence = models.PositiveBigIntegerField(default=0)  # Sequence of the latest RoomEvent
+    events_since_snapshot = models.PositiveIntegerField(default=0)  # Text and drawing events since the last snapshot
 
     class Meta:
         ordering = ['-created_at']
@@ -20,14 +25,46 @@ class Message(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
+    sequence = models.PositiveBigIntegerField()  # Sequence of the matching RoomEvent
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['created_at']
+        ordering = ['sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'sequence'], name='unique_message_sequence'),
+        ]
 
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}"
 
+class RoomEvent(models.Model):
+    MESSAGE = 'message'
+    SHARED_TEXT = 'shared_text'
+    DRAWING = 'drawing'
+    SNAPSHOT = 'snapshot'
+    KIND_CHOICES = [
+        (MESSAGE, 'Message'),
+        (SHARED_TEXT, 'Shared text'),
+        (DRAWING, 'Drawing'),
+        (SNAPSHOT, 'Snapshot'),
+    ]
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='events')
+    sequence = models.PositiveBigIntegerField()  # Monotonically increasing per room
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'sequence'], name='unique_room_event_sequence'),
+        ]
+
+    def __str__(self):
+        return f"Room {self.room_id} #{self.sequence} {self.kind}"
+
 class WebSocketTicket(models.Model):
     token = models.CharField(max_length=64, unique=True, default=uuid.uuid4)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -1,8 +1,10 @@
 from datetime import timedelta
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
-from .models import Room, Message, WebSocketTicket
+from .models import Room, Message, RoomEvent, WebSocketTicket
 from django.contrib.auth.models import User
+from .events import apply_events, content_events
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -25,13 +27,37 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ['id', 'room', 'sender', 'content', 'created_at']
+        fields = ['id', 'room', 'sender', 'content', 'sequence', 'created_at']
+        read_only_fields = ['sequence']
 
 class RoomSerializer(serializers.ModelSerializer):
     #messages = MessageSerializer(many=True, read_only=True)
     class Meta:
         model = Room
-        fields = ['id', 'code', 'created_at', 'updated_at', 'drawing_data', 'shared_text']
+        fields = ['id', 'code', 'created_at', 'updated_at', 'version', 'drawing_data', 'shared_text']
+        read_only_fields = ['version']
+
+    def update(self, instance, validated_data):
+        # Content changes go through the event log so they get a sequence under the room lock.
+        request = self.context.get('request')
+        events = content_events(validated_data, getattr(request, 'user', None))
+        validated_data.pop('shared_text', None)
+        validated_data.pop('drawing_data', None)
+        with transaction.atomic():
+            if validated_data:
+                for attr, value in validated_data.items():
+                    setattr(instance, attr, value)
+                instance.save(update_fields=[*validated_data, 'updated_at'])
+            apply_events(instance.code, events)
+        instance.refresh_from_db()
+        return instance
+
+class RoomEventSerializer(serializers.ModelSerializer):
+    sender = UserSerializer(read_only=True)
+
+    class Meta:
+        model = RoomEvent
+        fields = ['sequence', 'kind', 'sender', 'payload', 'created_at']
 
 class WebSocketTicketSerializer(serializers.ModelSerializer):
     class Meta:
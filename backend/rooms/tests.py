@@ -1,3 +1,235 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .events import SNAPSHOT_INTERVAL, apply_events, rebuild_state
+from .models import Message, Room, RoomEvent, WebSocketTicket
+from .consumers import RoomConsumer
+from .routing import websocket_urlpatterns
+
+class RoomDetailConditionalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.room = Room.objects.create()
+        self.url = reverse('room-detail', kwargs={'code': self.room.code})
+
+    def test_matching_etag_returns_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_update(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(self.url, {'shared_text': 'hello'}, format='json')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['shared_text'], 'hello')
+        self.assertEqual(response.data['version'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_alone_does_not_return_not_modified(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_since_version_omits_unchanged_fields(self):
+        self.client.patch(self.url, {'shared_text': 'hello'}, format='json')
+        self.client.patch(self.url, {'drawing_data': {'elements': [1]}}, format='json')
+
+        response = self.client.get(self.url, {'since_version': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 2)
+        self.assertNotIn('shared_text', response.data)
+        self.assertEqual(response.data['drawing_data'], {'elements': [1]})
+
+        response = self.client.get(self.url, {'since_version': 2})
+        self.assertNotIn('shared_text', response.data)
+        self.assertNotIn('drawing_data', response.data)
+
+    def test_since_version_ahead_of_room_returns_full_body(self):
+        self.client.patch(self.url, {'shared_text': 'hello'}, format='json')
+
+        response = self.client.get(self.url, {'since_version': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual(response.data['shared_text'], 'hello')
+        self.assertEqual(response.data['drawing_data'], {})
+
+    def test_since_version_uses_loaded_row_over_stale_probe(self):
+        self.client.patch(self.url, {'shared_text': 'hello'}, format='json')
+        stale_probe = {'version': 0, 'text_version': 0, 'drawing_version': 0, 'updated_at': self.room.updated_at}
+
+        with mock.patch('rooms.views.room_version', return_value=stale_probe):
+            response = self.client.get(self.url, {'since_version': 0})
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual(response.data['shared_text'], 'hello')
+        self.assertEqual(response['ETag'], 'W/"1"')
+
+    def test_invalid_since_version_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'since_version': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since_version': -1}).status_code, 400)
+
+class RoomEventLogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.room = Room.objects.create()
+
+    def text_event(self, text):
+        return {'kind': RoomEvent.SHARED_TEXT, 'payload': {'shared_text': text}, 'sender': self.user}
+
+    def test_apply_events_assigns_consecutive_sequences(self):
+        apply_events(self.room.code, [self.text_event('a'), self.text_event('b')])
+        apply_events(self.room.code, [self.text_event('c')])
+
+        self.assertEqual(list(self.room.events.values_list('sequence', flat=True)), [1, 2, 3])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_sequence, 3)
+        self.assertEqual(self.room.shared_text, 'c')
+        self.assertEqual(self.room.version, 3)
+
+    def test_snapshot_written_at_interval_boundary(self):
+        apply_events(self.room.code, [self.text_event(str(i)) for i in range(SNAPSHOT_INTERVAL - 1)])
+        self.assertFalse(self.room.events.filter(kind=RoomEvent.SNAPSHOT).exists())
+
+        events = apply_events(self.room.code, [self.text_event('last')])
+        self.assertEqual([event.kind for event in events], [RoomEvent.SHARED_TEXT, RoomEvent.SNAPSHOT])
+        snapshot = self.room.events.get(kind=RoomEvent.SNAPSHOT)
+        self.assertEqual(snapshot.sequence, SNAPSHOT_INTERVAL + 1)
+        self.assertEqual(snapshot.payload, {'shared_text': 'last', 'drawing_data': {}})
+
+    def test_chat_messages_do_not_trigger_snapshots(self):
+        message = {'kind': RoomEvent.MESSAGE, 'payload': {'content': 'hi'}, 'sender': self.user}
+        apply_events(self.room.code, [message] * SNAPSHOT_INTERVAL)
+        apply_events(self.room.code, [self.text_event('a')])
+
+        self.assertFalse(self.room.events.filter(kind=RoomEvent.SNAPSHOT).exists())
+
+    def test_rebuild_state_from_snapshot_and_tail(self):
+        apply_events(self.room.code, [self.text_event(str(i)) for i in range(SNAPSHOT_INTERVAL)])
+        apply_events(self.room.code, [
+            self.text_event('tail'),
+            {'kind': RoomEvent.DRAWING, 'payload': {'drawing_data': {'elements': [1]}}},
+        ])
+
+        self.assertEqual(rebuild_state(self.room), {'shared_text': 'tail', 'drawing_data': {'elements': [1]}})
+        self.assertEqual(rebuild_state(self.room, up_to=2)['shared_text'], '1')
+
+    def test_room_creation_is_logged(self):
+        response = self.client.post(reverse('room-list'), {'shared_text': 'initial board'}, format='json')
+
+        room = Room.objects.get(code=response.data['code'])
+        self.assertEqual(room.events.get().kind, RoomEvent.SNAPSHOT)
+        self.assertEqual(rebuild_state(room), {'shared_text': 'initial board', 'drawing_data': {}})
+
+    def test_messages_share_the_event_sequence(self):
+        url = reverse('room-detail', kwargs={'code': self.room.code})
+        self.client.patch(url, {'shared_text': 'hello'}, format='json')
+        response = self.client.post(reverse('create-message'), {'room': self.room.id, 'content': 'hi'}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['sequence'], 2)
+        event = self.room.events.get(sequence=2)
+        self.assertEqual((event.kind, event.payload), (RoomEvent.MESSAGE, {'content': 'hi'}))
+        self.assertEqual(Message.objects.get().sequence, 2)
+
+    def test_event_list_after_sequence(self):
+        apply_events(self.room.code, [self.text_event('a'), self.text_event('b'), self.text_event('c')])
+
+        response = self.client.get(reverse('room-event-list', kwargs={'room_code': self.room.code}), {'after': 1})
+        self.assertEqual([event['sequence'] for event in response.data['results']], [2, 3])
+
+class RoomConsumerEventTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.room = Room.objects.create()
+
+    async def connect(self):
+        ticket = await database_sync_to_async(WebSocketTicket.objects.create)(
+            user=self.user, expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'ws/room/{self.room.code}?token={ticket.token}'
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_rebuild_state_matches_room_after_mixed_writes(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'action': 'save_shared_text', 'shared_text': 'a'})
+        await database_sync_to_async(self.client.patch)(
+            reverse('room-detail', kwargs={'code': self.room.code}), {'shared_text': 'b'}, format='json'
+        )
+        await communicator.send_json_to({'action': 'save_drawing', 'drawing_data': {'elements': [1]}})
+        await communicator.send_json_to({'action': 'message', 'content': 'hi'})
+        broadcast = await communicator.receive_json_from()
+        await communicator.disconnect()
+        self.assertEqual(broadcast['sequence'], 4)
+
+        await database_sync_to_async(self.room.refresh_from_db)()
+        state = await database_sync_to_async(rebuild_state)(self.room)
+        self.assertEqual(state, {'shared_text': self.room.shared_text, 'drawing_data': self.room.drawing_data})
+        sequences = await database_sync_to_async(list)(self.room.events.values_list('sequence', flat=True))
+        self.assertEqual(sequences, list(range(1, self.room.last_sequence + 1)))
+
+    async def test_failed_write_closes_socket(self):
+        communicator = await self.connect()
+        await database_sync_to_async(self.room.delete)()
+
+        with self.assertLogs('rooms.consumers', level='ERROR'):
+            await communicator.send_json_to({'action': 'save_shared_text', 'shared_text': 'lost'})
+            output = await communicator.receive_output()
+        self.assertEqual(output, {'type': 'websocket.close', 'code': 4004})
+
+    async def test_message_is_broadcast_after_it_is_written(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'action': 'message', 'content': 'hi'})
+        broadcast = await communicator.receive_json_from()
+
+        message = await database_sync_to_async(Message.objects.get)()
+        self.assertEqual((broadcast['content'], broadcast['sequence']), ('hi', message.sequence))
+        await communicator.disconnect()
+
+    async def test_invalid_events_are_rejected(self):
+        communicator = await self.connect()
+        with self.assertLogs('rooms.consumers', level='WARNING'):
+            await communicator.send_json_to({'action': 'message'})
+            await communicator.send_json_to({'action': 'save_drawing'})
+            await communicator.send_json_to({'action': 'message', 'content': 'hi'})
+            await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        kinds = await database_sync_to_async(list)(self.room.events.values_list('kind', flat=True))
+        self.assertEqual(kinds, [RoomEvent.MESSAGE])
+
+    async def test_failing_event_does_not_drop_the_batch(self):
+        consumer = RoomConsumer()
+        consumer.room_code = str(self.room.code)
+        events = [
+            {'kind': RoomEvent.SHARED_TEXT, 'payload': {'shared_text': 'kept'}, 'sender': self.user},
+            {'kind': RoomEvent.MESSAGE, 'payload': {'content': None}, 'sender': self.user},
+        ]
+
+        with self.assertLogs('rooms.consumers', level='ERROR'):
+            room_events = await consumer.write_events(events)
+        self.assertEqual([event.kind for event in room_events], [RoomEvent.SHARED_TEXT])
+        await database_sync_to_async(self.room.refresh_from_db)()
+        self.assertEqual(self.room.shared_text, 'kept')
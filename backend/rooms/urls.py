@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import RoomListCreateView, RoomDetailView, MessageCreateView, MessageListView, UserRegistrationView, CreateWebSocketTicketView
+from .views import RoomListCreateView, RoomDetailView, MessageCreateView, MessageListView, RoomEventListView, UserRegistrationView, CreateWebSocketTicketView
 
 urlpatterns = [
     path('register', UserRegistrationView.as_view(), name='user-register'),
@@ -7,5 +7,6 @@ urlpatterns = [
     path('rooms/<uuid:code>', RoomDetailView.as_view(), name='room-detail'),
     path('messages', MessageCreateView.as_view(), name='create-message'),
     path('rooms/<uuid:room_code>/messages', MessageListView.as_view(), name='message-list'),
+    path('rooms/<uuid:room_code>/events', RoomEventListView.as_view(), name='room-event-list'),
     path('ws-ticket', CreateWebSocketTicketView.as_view(), name='create-websocket-ticket'),
 ]
@@ -1,9 +1,15 @@
+from django.db import transaction
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views.decorators.http import condition
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from rest_framework.pagination import PageNumberPagination, CursorPagination
-from .models import Room, Message, WebSocketTicket
-from .serializers import RoomSerializer, MessageSerializer, UserRegistrationSerializer, WebSocketTicketSerializer
+from .events import apply_events, snapshot_room
+from .models import Room, Message, RoomEvent, WebSocketTicket
+from .serializers import RoomSerializer, MessageSerializer, RoomEventSerializer, UserRegistrationSerializer, WebSocketTicketSerializer
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
@@ -28,6 +34,29 @@ class RoomListCreateView(generics.ListCreateAPIView):
     throttle_classes = [UserRateThrottle]
     pagination_class = StandardResultsSetPagination
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            room = serializer.save()
+            snapshot_room(room.code)
+
+def room_version(request, code):
+    """Fetch the room's version columns without loading its content, once per request."""
+    if not hasattr(request, '_room_version'):
+        request._room_version = Room.objects.filter(code=code).order_by().values(
+            'version', 'text_version', 'drawing_version', 'updated_at'
+        ).first()
+    return request._room_version
+
+def version_etag(version):
+    return f'W/"{version}"'
+
+def room_etag(request, code):
+    version = room_version(request, code)
+    return version_etag(version['version']) if version else None
+
+# Only the ETag validates: updated_at is truncated to whole seconds in Last-Modified,
+# so If-Modified-Since could miss an edit made later in the same second.
+@method_decorator(condition(etag_func=room_etag), name='get')
 class RoomDetailView(generics.RetrieveUpdateAPIView):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
@@ -35,9 +64,56 @@ class RoomDetailView(generics.RetrieveUpdateAPIView):
     throttle_classes = [UserRateThrottle]
     lookup_field = 'code'
 
+    def get_since_version(self):
+        since_version = self.request.query_params.get('since_version')
+        if since_version is None:
+            return None
+        try:
+            since_version = int(since_version)
+        except ValueError:
+            raise ValidationError({'since_version': 'A valid integer is required.'})
+        if since_version < 0:
+            raise ValidationError({'since_version': 'Ensure this value is greater than or equal to 0.'})
+        return since_version
+
+    def get_stale_fields(self):
+        """Content fields the version probe says the client already has, so they need not be loaded."""
+        since_version = self.get_since_version()
+        if since_version is None or self.request.method != 'GET':
+            return []
+        version = room_version(self.request, self.kwargs['code'])
+        if version is None or since_version > version['version']:
+            return []
+        stale_fields = []
+        if version['text_version'] <= since_version:
+            stale_fields.append('shared_text')
+        if version['drawing_version'] <= since_version:
+            stale_fields.append('drawing_data')
+        return stale_fields
+
+    def get_queryset(self):
+        return super().get_queryset().defer(*self.get_stale_fields())
+
+    def retrieve(self, request, *args, **kwargs):
+        since_version = self.get_since_version()
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        # Decide from the loaded row rather than the probe, which a concurrent save may have
+        # overtaken; a field that changed since the probe is loaded on access. A since_version
+        # ahead of the room was not issued by this server, so the client gets the full body.
+        if since_version is not None and since_version <= instance.version:
+            if instance.text_version <= since_version:
+                serializer.fields.pop('shared_text')
+            if instance.drawing_version <= since_version:
+                serializer.fields.pop('drawing_data')
+        response = Response(serializer.data)
+        response['ETag'] = version_etag(instance.version)
+        response['Last-Modified'] = http_date(instance.updated_at.timestamp())
+        return response
+
 class MessageCursorPagination(CursorPagination):
     page_size = 20
-    ordering = '-created_at'
+    ordering = '-sequence'
 
 class MessageCreateView(generics.ListCreateAPIView):
     serializer_class = MessageSerializer
@@ -47,11 +123,17 @@ class MessageCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         room_id = self.request.query_params.get('room_id')
         if room_id is not None:
-            return Message.objects.filter(room_id=room_id).order_by('-created_at')
+            return Message.objects.filter(room_id=room_id).order_by('-sequence')
         return Message.objects.none()
 
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user)
+        room = serializer.validated_data['room']
+        events = apply_events(room.code, [{
+            'kind': RoomEvent.MESSAGE,
+            'payload': {'content': serializer.validated_data['content']},
+            'sender': self.request.user,
+        }])
+        serializer.instance = Message.objects.get(room=room, sequence=events[0].sequence)
 
 class CreateWebSocketTicketView(generics.CreateAPIView):
     serializer_class = WebSocketTicketSerializer
@@ -68,3 +150,23 @@ class MessageListView(generics.ListAPIView):
     def get_queryset(self):
         room_code = self.kwargs['room_code']
         return Message.objects.filter(room__code=room_code)
+
+class RoomEventCursorPagination(CursorPagination):
+    page_size = 100
+    ordering = 'sequence'
+
+class RoomEventListView(generics.ListAPIView):
+    serializer_class = RoomEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RoomEventCursorPagination
+    throttle_classes = [UserRateThrottle]
+
+    def get_queryset(self):
+        queryset = RoomEvent.objects.filter(room__code=self.kwargs['room_code']).select_related('sender')
+        after = self.request.query_params.get('after')
+        if after is not None:
+            try:
+                queryset = queryset.filter(sequence__gt=int(after))
+            except ValueError:
+                raise ValidationError({'after': 'A valid integer is required.'})
+        return queryset
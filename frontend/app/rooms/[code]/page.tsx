@@ -268,6 +268,7 @@ export default function RoomPage() {
                   {
                     content,
                     sender,
+                    sequence: response.sequence,
                   } as Message,
                 ]);
                 setShouldScrollToBottom(true); // Scroll to bottom when new messages arrive
@@ -8,6 +8,7 @@ export interface Message {
   content: string;
   sender: User;
   room_code?: string;
+  sequence?: number;
   created_at?: string;
 }
 
@@ -16,6 +17,7 @@ export interface Room {
   code: string;
   created_at: string;
   updated_at: string;
+  version: number;
   drawing_data?: string;
   shared_text?: string;
   messages: Message[];
@@ -77,6 +79,7 @@ export interface WebSocketResponse {
   action?: "update_shared_text" | "update_drawing";
   sender?: User;
   content?: string;
+  sequence?: number;
   shared_text?: string;
   drawing_data?: string;
 }
@@ -85,7 +88,7 @@ export interface WebSocketTicket {
   token: string;
 }
 
-export type WebSocketCloseCode = 4001 | 4002 | 4003;
+export type WebSocketCloseCode = 4001 | 4002 | 4003 | 4004;
 
 export interface WebSocketError extends Error {
   code?: WebSocketCloseCode;